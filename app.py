@@ -1,11 +1,15 @@
 import streamlit as st
 import os
+import json
+import uuid
+import asyncio
+import hashlib
+from bisect import bisect_right
 from datetime import datetime
 import plotly.graph_objects as go
-import plotly.express as px
 from streamlit_ace import st_ace
 from src.config import Config
-from src.code_analyzer import CodeAnalyzer
+from src.code_analyzer import BatchAnalysisError, CodeAnalyzer, create_error_result
 
 # Page config
 st.set_page_config(
@@ -16,7 +20,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .main-header {
         background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
@@ -52,26 +56,204 @@ st.markdown("""
         background-color: #667eea;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+HEADER_HTML = """
+<div class="main-header">
+    <h1>🧠 AI Code Auditor</h1>
+    <p>Upload your code and get instant AI-powered quality, security, and performance analysis</p>
+</div>
+"""
+
+FOOTER_HTML = """
+<div style="text-align: center; color: #666; margin-top: 2rem;">
+    🧠 AI Code Auditor - Powered by OpenAI GPT-4o | Made with ❤️ using Streamlit
+</div>
+"""
+
+# Streamlit drops any element a rerun does not emit again, so the styles are
+# sent on every run rather than once per session
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+# Lower bounds of the fair, good and excellent score bands
+SCORE_THRESHOLDS = (4, 6, 8)
+SCORE_CLASSES = ("score-poor", "score-fair", "score-good", "score-excellent")
+
+# Maximum number of entries kept in the per-session analysis history
+MAX_HISTORY = 100
+
+# Uploads above this size are rejected before they are decoded or sent to the API
+MAX_UPLOAD_BYTES = 256 * 1024
+
+# Uploads whose leading characters contain more control characters than this
+# ratio are treated as binary
+BINARY_SAMPLE_CHARS = 4096
+BINARY_CONTROL_RATIO = 0.05
+
+# Where analysis histories are persisted between server restarts
+HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".streamlit", "history")
+
+def get_history_id():
+    """Get the history id from the page URL, assigning a new one if needed"""
+    history_id = st.query_params.get("history")
+    try:
+        return uuid.UUID(history_id).hex
+    except (TypeError, ValueError):
+        history_id = uuid.uuid4().hex
+        st.query_params["history"] = history_id
+        return history_id
+
+def load_history(history_id):
+    """Load a persisted analysis history, or an empty one if none exists"""
+    try:
+        with open(os.path.join(HISTORY_DIR, f"{history_id}.json"), encoding="utf-8") as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if not isinstance(history, list):
+        return []
+    
+    # Drop malformed entries so one bad record cannot break the sidebar
+    history = [
+        entry for entry in history
+        if isinstance(entry, dict)
+        and isinstance(entry.get('timestamp'), str)
+        and isinstance(entry.get('filename'), str)
+        and isinstance(entry.get('overall_score'), (int, float))
+        and not isinstance(entry.get('overall_score'), bool)
+    ]
+    return history[-MAX_HISTORY:]
+
+def save_history(history_id, history):
+    """Persist an analysis history to disk"""
+    path = os.path.join(HISTORY_DIR, f"{history_id}.json")
+    try:
+        os.makedirs(HISTORY_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(history, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass
 
 def initialize_session_state():
     """Initialize session state variables"""
     if 'analysis_results' not in st.session_state:
         st.session_state.analysis_results = None
+    if 'history_id' not in st.session_state:
+        st.session_state.history_id = get_history_id()
     if 'analysis_history' not in st.session_state:
-        st.session_state.analysis_history = []
+        st.session_state.analysis_history = load_history(st.session_state.history_id)
+    if 'batch_results' not in st.session_state:
+        st.session_state.batch_results = None
+
+def record_analysis(filename, overall_score):
+    """Append an analysis to the persisted history, keeping only the latest entries"""
+    # Re-read the file so entries saved by other sessions on the same history are kept
+    history = load_history(st.session_state.history_id)
+    history.append({
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M"),
+        'filename': filename,
+        'overall_score': overall_score
+    })
+    del history[:-MAX_HISTORY]
+    save_history(st.session_state.history_id, history)
+    st.session_state.analysis_history = history
+
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def _cached_analyze(code_hash, _code, filename, model, flags, _api_key):
+    """Stream an analysis into the page, memoized on the code hash, model and analysis flags"""
+    config = Config(api_key=_api_key, model=model)
+    analyzer = CodeAnalyzer(config)
+    include_security, include_performance, include_style = flags
+    
+    with st.expander("🧠 AI is analyzing your code...", expanded=True):
+        result_text = st.write_stream(analyzer.analyze_code_stream(
+            _code,
+            filename=filename,
+            include_security=include_security,
+            include_performance=include_performance,
+            include_style=include_style
+        ))
+    
+    # Raise on unusable responses so they are never cached
+    return analyzer.parse_analysis_response(result_text, strict=True)
+
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False)
+def _cached_analyze_batch(batch_hash, _files, model, flags, concurrent, _api_key):
+    """Analyze several files at once, memoized on their combined hash"""
+    config = Config(api_key=_api_key, model=model)
+    analyzer = CodeAnalyzer(config)
+    include_security, include_performance, include_style = flags
+    
+    analyze = analyzer.analyze_concurrent if concurrent else analyzer.analyze_batch
+    results = asyncio.run(analyze(
+        list(_files),
+        include_security=include_security,
+        include_performance=include_performance,
+        include_style=include_style
+    ))
+    
+    # Raise on any failed file so partial or failed batches are never cached
+    if any(isinstance(result, Exception) for result in results):
+        raise BatchAnalysisError(results)
+    return results
+
+def hash_files(files):
+    """Hash a sequence of (filename, code) pairs"""
+    digest = hashlib.sha256()
+    for filename, code in files:
+        digest.update(filename.encode())
+        digest.update(b"\0")
+        digest.update(code.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def decode_upload(name, size, file_id, _file):
+    """Decode an uploaded file, memoized on its name, size and upload id
+    
+    Returns None when the file is not UTF-8 text.
+    """
+    try:
+        content = _file.getvalue().decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    return None if looks_binary(content) else content
+
+def looks_binary(content):
+    """Guess whether decoded content is binary from its share of control characters"""
+    sample = content[:BINARY_SAMPLE_CHARS]
+    if not sample:
+        return False
+    control_chars = sum(c < ' ' and c not in '\n\r\t' for c in sample)
+    return control_chars / len(sample) > BINARY_CONTROL_RATIO
+
+def load_uploads(uploaded_files):
+    """Decode the uploaded files that are small text files, reporting the rest"""
+    loaded = []
+    for file in uploaded_files:
+        if file.size > MAX_UPLOAD_BYTES:
+            st.error(f"❌ {file.name} is too large (over {MAX_UPLOAD_BYTES // 1024}KB) and was skipped")
+            continue
+        
+        content = decode_upload(file.name, file.size, file.file_id, file)
+        if content is None:
+            st.error(f"❌ {file.name} does not look like a text file and was skipped")
+            continue
+        
+        loaded.append((file, content))
+    
+    return loaded
 
 def get_score_class(score):
     """Get CSS class based on score"""
-    if score >= 8: return "score-excellent"
-    elif score >= 6: return "score-good"
-    elif score >= 4: return "score-fair"
-    else: return "score-poor"
+    return SCORE_CLASSES[bisect_right(SCORE_THRESHOLDS, score)]
 
-def create_score_chart(scores):
-    """Create a radar chart for scores"""
-    categories = list(scores.keys())
-    values = list(scores.values())
+@st.cache_data(max_entries=64, show_spinner=False)
+def create_score_chart(scores_items):
+    """Create a radar chart for a tuple of (category, score) pairs"""
+    categories = [category for category, _ in scores_items]
+    values = [score for _, score in scores_items]
     
     fig = go.Figure()
     
@@ -97,6 +279,29 @@ def create_score_chart(scores):
     
     return fig
 
+@st.cache_data(max_entries=16, show_spinner=False)
+def create_history_chart(overall_scores):
+    """Create a trend line for a tuple of overall scores"""
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scattergl(
+        x=list(range(1, len(overall_scores) + 1)),
+        y=list(overall_scores),
+        mode='lines+markers',
+        name='Overall Score',
+        line_color='rgb(102, 126, 234)'
+    ))
+    
+    fig.update_layout(
+        yaxis=dict(range=[0, 10]),
+        xaxis=dict(title="Analysis"),
+        showlegend=False,
+        height=200,
+        margin=dict(l=10, r=10, t=10, b=10)
+    )
+    
+    return fig
+
 def display_analysis_results(results):
     """Display analysis results in a beautiful format"""
     st.markdown('<div class="analysis-section">', unsafe_allow_html=True)
@@ -114,20 +319,20 @@ def display_analysis_results(results):
     with col1:
         quality_score = results['scores']['Quality']
         st.metric("📊 Code Quality", f"{quality_score}/10", 
-                 delta=f"{quality_score - 6:.1f}" if quality_score > 6 else f"{quality_score - 6:.1f}")
+                 delta=f"{quality_score - 6:+.1f}")
     
     with col2:
         security_score = results['scores']['Security']
         st.metric("🔒 Security", f"{security_score}/10",
-                 delta=f"{security_score - 7:.1f}" if security_score > 7 else f"{security_score - 7:.1f}")
+                 delta=f"{security_score - 7:+.1f}")
     
     with col3:
         performance_score = results['scores']['Performance']
         st.metric("⚡ Performance", f"{performance_score}/10",
-                 delta=f"{performance_score - 6:.1f}" if performance_score > 6 else f"{performance_score - 6:.1f}")
+                 delta=f"{performance_score - 6:+.1f}")
     
     # Radar chart
-    st.plotly_chart(create_score_chart(results['scores']), use_container_width=True)
+    st.plotly_chart(create_score_chart(tuple(results['scores'].items())), use_container_width=True)
     
     # Detailed analysis
     col1, col2 = st.columns(2)
@@ -159,12 +364,7 @@ def main():
     initialize_session_state()
     
     # Header
-    st.markdown("""
-    <div class="main-header">
-        <h1>🧠 AI Code Auditor</h1>
-        <p>Upload your code and get instant AI-powered quality, security, and performance analysis</p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
     
     # Sidebar
     with st.sidebar:
@@ -192,11 +392,22 @@ def main():
         # Model selection
         model = st.selectbox("🤖 AI Model", ["gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo"])
         
+        # Multi-file strategy
+        multi_file_mode = st.radio(
+            "🗂️ Multi-file Analysis",
+            ["Batched requests", "Concurrent requests"],
+            help="Pack as many files into each request as the model's output limit allows, "
+                 "or send one request per file; either way requests run in parallel"
+        )
+        
         st.markdown("---")
         
         # History
         if st.session_state.analysis_history:
             st.markdown("### 📊 Analysis History")
+            if len(st.session_state.analysis_history) > 1:
+                overall_scores = tuple(a['overall_score'] for a in st.session_state.analysis_history)
+                st.plotly_chart(create_history_chart(overall_scores), use_container_width=True)
             for i, analysis in enumerate(reversed(st.session_state.analysis_history[-5:])):
                 st.write(f"{i+1}. {analysis['timestamp']}: {analysis['overall_score']}/10")
     
@@ -211,47 +422,90 @@ def main():
             type=['py', 'js', 'ts', 'java', 'cpp', 'c', 'go', 'rs', 'php', 'rb']
         )
         
-        if uploaded_files:
-            for file in uploaded_files:
-                st.write(f"📄 **{file.name}** ({file.size} bytes)")
-                
-                # Show file content
-                content = file.read().decode('utf-8')
-                st.code(content, language='python')
+        uploads = load_uploads(uploaded_files or [])
+        
+        if uploads:
+            selected = st.selectbox(
+                "📄 File",
+                range(len(uploads)),
+                format_func=lambda i: uploads[i][0].name
+            )
+            file, content = uploads[selected]
+            st.write(f"📄 **{file.name}** ({file.size} bytes)")
+            
+            # Show file content
+            st.code(content, language='python')
+            
+            # Analyze button
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col2:
+                if st.button("🔍 Analyze File", use_container_width=True):
+                    if api_key:
+                        try:
+                            results = _cached_analyze(
+                                hashlib.sha256(content.encode()).hexdigest(),
+                                content,
+                                file.name,
+                                model,
+                                (include_security, include_performance, include_style),
+                                api_key
+                            )
+                            
+                            # Store results
+                            st.session_state.analysis_results = results
+                            st.session_state.batch_results = None
+                            record_analysis(file.name, results['overall_score'])
+                            
+                            st.success("✅ Analysis complete! Check the 'Analysis Results' tab.")
+                            st.rerun()
+                            
+                        except Exception as e:
+                            st.session_state.analysis_results = create_error_result(str(e))
+                            st.session_state.batch_results = None
+                            st.error(f"❌ Analysis failed: {str(e)}")
+                    else:
+                        st.error("❌ Please enter your OpenAI API key in the sidebar first!")
                 
-                # Analyze button
-                col1, col2, col3 = st.columns([1, 2, 1])
-                with col2:
-                    if st.button(f"🔍 Analyze {file.name}", key=f"analyze_{file.name}", use_container_width=True):
-                        if api_key:
+                if len(uploads) > 1 and st.button(f"🔍 Analyze All {len(uploads)} Files", use_container_width=True):
+                    if api_key:
+                        try:
+                            files = tuple((f.name, code) for f, code in uploads)
+                            
                             with st.spinner("🧠 AI is analyzing your code..."):
                                 try:
-                                    config = Config(api_key=api_key, model=model)
-                                    analyzer = CodeAnalyzer(config)
-                                    
-                                    results = analyzer.analyze_code(
-                                        content, 
-                                        filename=file.name,
-                                        include_security=include_security,
-                                        include_performance=include_performance,
-                                        include_style=include_style
+                                    batch_results = _cached_analyze_batch(
+                                        hash_files(files),
+                                        files,
+                                        model,
+                                        (include_security, include_performance, include_style),
+                                        multi_file_mode == "Concurrent requests",
+                                        api_key
                                     )
-                                    
-                                    # Store results
-                                    st.session_state.analysis_results = results
-                                    st.session_state.analysis_history.append({
-                                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M"),
-                                        'filename': file.name,
-                                        'overall_score': results['overall_score']
-                                    })
-                                    
-                                    st.success("✅ Analysis complete! Check the 'Analysis Results' tab.")
-                                    st.rerun()
-                                    
-                                except Exception as e:
-                                    st.error(f"❌ Analysis failed: {str(e)}")
-                        else:
-                            st.error("❌ Please enter your OpenAI API key in the sidebar first!")
+                                except BatchAnalysisError as e:
+                                    batch_results = e.results
+                            
+                            # Store results keyed on upload position so duplicate names stay distinct
+                            st.session_state.batch_results = {}
+                            failed = 0
+                            for index, ((filename, _), results) in enumerate(zip(files, batch_results), 1):
+                                if isinstance(results, Exception):
+                                    results = create_error_result(str(results))
+                                    failed += 1
+                                else:
+                                    record_analysis(filename, results['overall_score'])
+                                st.session_state.batch_results[f"{index}. {filename}"] = results
+                            st.session_state.analysis_results = next(iter(st.session_state.batch_results.values()))
+                            
+                            if failed:
+                                st.error(f"❌ {failed} of {len(files)} files could not be analyzed. Check the 'Analysis Results' tab.")
+                            else:
+                                st.success("✅ Analysis complete! Check the 'Analysis Results' tab.")
+                                st.rerun()
+                            
+                        except Exception as e:
+                            st.error(f"❌ Analysis failed: {str(e)}")
+                    else:
+                        st.error("❌ Please enter your OpenAI API key in the sidebar first!")
     
     with tab2:
         st.markdown("### ✏️ Code Editor")
@@ -273,38 +527,38 @@ def main():
             with col2:
                 if st.button("🔍 Analyze Code", use_container_width=True):
                     if api_key:
-                        with st.spinner("🧠 AI is analyzing your code..."):
-                            try:
-                                config = Config(api_key=api_key, model=model)
-                                analyzer = CodeAnalyzer(config)
-                                
-                                results = analyzer.analyze_code(
-                                    code_content,
-                                    filename="editor.py",
-                                    include_security=include_security,
-                                    include_performance=include_performance,
-                                    include_style=include_style
-                                )
+                        try:
+                            results = _cached_analyze(
+                                hashlib.sha256(code_content.encode()).hexdigest(),
+                                code_content,
+                                "editor.py",
+                                model,
+                                (include_security, include_performance, include_style),
+                                api_key
+                            )
                                 
-                                # Store results
-                                st.session_state.analysis_results = results
-                                st.session_state.analysis_history.append({
-                                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M"),
-                                    'filename': 'Code Editor',
-                                    'overall_score': results['overall_score']
-                                })
+                            # Store results
+                            st.session_state.analysis_results = results
+                            st.session_state.batch_results = None
+                            record_analysis('Code Editor', results['overall_score'])
                                 
-                                st.success("✅ Analysis complete! Check the 'Analysis Results' tab.")
-                                st.rerun()
+                            st.success("✅ Analysis complete! Check the 'Analysis Results' tab.")
+                            st.rerun()
                                 
-                            except Exception as e:
-                                st.error(f"❌ Analysis failed: {str(e)}")
+                        except Exception as e:
+                            st.session_state.analysis_results = create_error_result(str(e))
+                            st.session_state.batch_results = None
+                            st.error(f"❌ Analysis failed: {str(e)}")
                     else:
                         st.error("❌ Please enter your OpenAI API key in the sidebar first!")
     
     with tab3:
         st.markdown("### 📊 Analysis Results")
         
+        if st.session_state.batch_results:
+            batch_file = st.selectbox("📄 File", list(st.session_state.batch_results), key="batch_file")
+            st.session_state.analysis_results = st.session_state.batch_results[batch_file]
+        
         if st.session_state.analysis_results:
             display_analysis_results(st.session_state.analysis_results)
             
@@ -313,6 +567,13 @@ def main():
             with col2:
                 if st.button("📥 Export Results", use_container_width=True):
                     # Create downloadable report
+                    issues_text = "\n".join(
+                        f"- {issue['type']}: {issue['description']}"
+                        for issue in st.session_state.analysis_results['issues']
+                    )
+                    recommendations_text = "\n".join(
+                        f"- {rec}" for rec in st.session_state.analysis_results['recommendations']
+                    )
                     report = f"""
 # AI Code Audit Report
 
@@ -325,10 +586,10 @@ def main():
 - Performance: {st.session_state.analysis_results['scores']['Performance']}/10
 
 ## Issues Found
-{chr(10).join([f"- {issue['type']}: {issue['description']}" for issue in st.session_state.analysis_results['issues']])}
+{issues_text}
 
 ## Recommendations
-{chr(10).join([f"- {rec}" for rec in st.session_state.analysis_results['recommendations']])}
+{recommendations_text}
 """
                     
                     st.download_button(
@@ -342,11 +603,7 @@ def main():
     
     # Footer
     st.markdown("---")
-    st.markdown("""
-    <div style="text-align: center; color: #666; margin-top: 2rem;">
-        🧠 AI Code Auditor - Powered by OpenAI GPT-4o | Made with ❤️ using Streamlit
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(FOOTER_HTML, unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,15 +1,69 @@
+import asyncio
 import json
-import re
-from typing import Dict, List, Any, Optional
-from openai import OpenAI
+from typing import Dict, Iterator, List, Any, Optional, Tuple, Union
+import streamlit as st
+from openai import AsyncOpenAI, OpenAI
 from src.config import Config
+from src.schemas import AnalysisResult, BatchAnalysisResult
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+_VALID_SEVERITIES = frozenset({"Low", "Medium", "High", "Critical"})
+_VALID_TYPES = frozenset({"Quality", "Security", "Performance"})
+
+# Score categories in the order their weights are cached on the analyzer
+_SCORE_CATEGORIES = ("Quality", "Security", "Performance")
+
+# Output token ceilings by model family; other models get the default
+_MAX_OUTPUT_TOKENS = {"gpt-4o": 16384}
+_DEFAULT_MAX_OUTPUT_TOKENS = 4096
+
+# Model families that accept json_schema structured outputs
+_STRUCTURED_OUTPUT_MODELS = ("gpt-4o",)
+
+def _json_schema_format(schema: type) -> Dict[str, Any]:
+    """Build a strict json_schema response format for a pydantic model"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": schema.__name__,
+            "schema": schema.model_json_schema(),
+            "strict": True
+        }
+    }
+
+_ANALYSIS_FORMAT = _json_schema_format(AnalysisResult)
+_BATCH_ANALYSIS_FORMAT = _json_schema_format(BatchAnalysisResult)
+
+class AnalysisError(Exception):
+    """Raised when a model response cannot be turned into analysis results"""
+
+class BatchAnalysisError(AnalysisError):
+    """Raised when some files of a multi-file analysis could not be analyzed"""
+    
+    def __init__(self, results: List[Union[Dict[str, Any], Exception]]):
+        self.results = results
+        failed = sum(isinstance(result, Exception) for result in results)
+        super().__init__(f"{failed} of {len(results)} files could not be analyzed")
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key: str) -> OpenAI:
+    """Get a shared OpenAI client for the given API key"""
+    return OpenAI(api_key=api_key)
 
 class CodeAnalyzer:
     """AI-powered code analyzer using OpenAI GPT models"""
     
     def __init__(self, config: Config):
         self.config = config
-        self.client = OpenAI(api_key=config.api_key)
+        self.client = get_openai_client(config.api_key)
+        self._score_weights = tuple(
+            config.score_weights[category.lower()] for category in _SCORE_CATEGORIES
+        )
         
     def analyze_code(
         self,
@@ -33,47 +87,280 @@ class CodeAnalyzer:
             Dictionary containing analysis results
         """
         
-        # Determine programming language
-        language = self.config.get_file_extension_language(filename) or "python"
+        try:
+            result_text = "".join(self.analyze_code_stream(
+                code, filename,
+                include_security, include_performance, include_style
+            ))
+        except Exception as e:
+            return self._create_error_result(f"Analysis failed: {str(e)}")
         
-        # Build analysis prompt
-        prompt = self._build_analysis_prompt(
-            code, language, filename,
-            include_security, include_performance, include_style
+        return self.parse_analysis_response(result_text)
+    
+    def analyze_code_stream(
+        self,
+        code: str,
+        filename: str = "code.py",
+        include_security: bool = True,
+        include_performance: bool = True,
+        include_style: bool = True
+    ) -> Iterator[str]:
+        """
+        Stream the raw JSON analysis text as the model generates it
+        
+        Args:
+            code: The source code to analyze
+            filename: Name of the file being analyzed
+            include_security: Whether to include security analysis
+            include_performance: Whether to include performance analysis
+            include_style: Whether to include style analysis
+            
+        Yields:
+            Chunks of the response text; pass the joined text to
+            parse_analysis_response once the stream is exhausted
+        """
+        
+        # Call OpenAI API
+        stream = self.client.chat.completions.create(
+            **self._build_request(
+                code, filename,
+                include_security, include_performance, include_style
+            ),
+            stream=True
         )
         
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    
+    def parse_analysis_response(self, result_text: str, strict: bool = False) -> Dict[str, Any]:
+        """
+        Parse and post-process the raw JSON text returned by the model
+        
+        Args:
+            result_text: The complete response text
+            strict: Raise AnalysisError instead of returning an error result
+                when the text cannot be parsed or processed
+            
+        Returns:
+            Dictionary containing analysis results
+        """
+        try:
+            return self._parse_or_raise(result_text)
+        except AnalysisError as e:
+            if strict:
+                raise
+            return self._create_error_result(str(e))
+    
+    def _parse_or_raise(self, result_text: str) -> Dict[str, Any]:
+        """Parse and post-process response text, raising AnalysisError on failure"""
+        try:
+            analysis_result = _json_loads(result_text)
+        except json.JSONDecodeError as e:
+            raise AnalysisError(f"Failed to parse AI response: {str(e)}") from e
+        
+        # Post-process and validate results
         try:
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.config.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self._get_system_prompt()
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=self.config.max_tokens,
-                temperature=self.config.temperature,
-                response_format={"type": "json_object"}
+            return self._process_analysis_result(analysis_result)
+        except Exception as e:
+            raise AnalysisError(f"Analysis failed: {str(e)}") from e
+    
+    async def analyze_batch(
+        self,
+        files: List[Tuple[str, str]],
+        include_security: bool = True,
+        include_performance: bool = True,
+        include_style: bool = True,
+        max_concurrency: int = 5
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Analyze several files, packing as many into each API request as the
+        model's output token limit allows and sending the requests concurrently
+        
+        Args:
+            files: List of (filename, code) pairs to analyze
+            include_security: Whether to include security analysis
+            include_performance: Whether to include performance analysis
+            include_style: Whether to include style analysis
+            max_concurrency: Maximum number of requests in flight at once
+            
+        Returns:
+            One entry per file, in input order: its analysis results, or the
+            exception that prevented analyzing it
+        """
+        
+        # Give every file its full max_tokens budget within a request
+        files_per_request = max(1, self._max_output_tokens() // self.config.max_tokens)
+        chunks = [
+            files[start:start + files_per_request]
+            for start in range(0, len(files), files_per_request)
+        ]
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async with AsyncOpenAI(api_key=self.config.api_key) as client:
+            async def analyze(chunk: List[Tuple[str, str]]) -> List[Union[Dict[str, Any], Exception]]:
+                async with semaphore:
+                    return await self._analyze_chunk(
+                        client, chunk,
+                        include_security, include_performance, include_style
+                    )
+            
+            chunk_results = await asyncio.gather(
+                *(analyze(chunk) for chunk in chunks),
+                return_exceptions=True
             )
+        
+        # A failed request or unparseable response fails every file in its chunk
+        results: List[Union[Dict[str, Any], Exception]] = []
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            if isinstance(chunk_result, BaseException):
+                results.extend([chunk_result] * len(chunk))
+            else:
+                results.extend(chunk_result)
+        
+        return results
+    
+    async def _analyze_chunk(
+        self,
+        client: AsyncOpenAI,
+        files: List[Tuple[str, str]],
+        include_security: bool,
+        include_performance: bool,
+        include_style: bool
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """Analyze files with a single API request, raising if the request or its response fails"""
+        
+        prompt = self._build_batch_prompt(
+            files, include_security, include_performance, include_style
+        )
+        
+        # Call OpenAI API
+        response = await client.chat.completions.create(
+            model=self.config.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": self._get_batch_system_prompt()
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            max_tokens=min(self.config.max_tokens * len(files), self._max_output_tokens()),
+            temperature=self.config.temperature,
+            response_format=self._get_response_format(_BATCH_ANALYSIS_FORMAT)
+        )
+        
+        try:
+            entries = _json_loads(response.choices[0].message.content)["files"]
+        except (json.JSONDecodeError, TypeError, KeyError) as e:
+            raise AnalysisError(f"Failed to parse AI response: {str(e)}") from e
+        if not isinstance(entries, list):
+            raise AnalysisError("Failed to parse AI response: 'files' is not a list")
+        
+        # Dispatch entries by the 1-based position given in the file headers
+        by_index = {}
+        for entry in entries:
+            if isinstance(entry, dict) and isinstance(entry.get("index"), int):
+                by_index.setdefault(entry["index"], entry)
+        
+        results: List[Union[Dict[str, Any], Exception]] = []
+        for index in range(1, len(files) + 1):
+            entry = by_index.get(index)
+            if entry is None:
+                results.append(AnalysisError("No analysis returned for this file"))
+                continue
+            try:
+                results.append(self._process_analysis_result(entry))
+            except Exception as e:
+                results.append(AnalysisError(f"Analysis failed: {str(e)}"))
+        
+        return results
+    
+    async def analyze_code_async(
+        self,
+        client: AsyncOpenAI,
+        code: str,
+        filename: str = "code.py",
+        include_security: bool = True,
+        include_performance: bool = True,
+        include_style: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Analyze code like analyze_code, using an async OpenAI client
+        
+        Args:
+            client: Async OpenAI client to send the request with
+            code: The source code to analyze
+            filename: Name of the file being analyzed
+            include_security: Whether to include security analysis
+            include_performance: Whether to include performance analysis
+            include_style: Whether to include style analysis
             
-            # Parse response
-            result_text = response.choices[0].message.content
-            analysis_result = json.loads(result_text)
+        Returns:
+            Dictionary containing analysis results
             
-            # Post-process and validate results
-            processed_result = self._process_analysis_result(analysis_result)
+        Raises:
+            AnalysisError: If the response cannot be parsed into results
+        """
+        
+        response = await client.chat.completions.create(
+            **self._build_request(
+                code, filename,
+                include_security, include_performance, include_style
+            )
+        )
+        
+        return self.parse_analysis_response(
+            response.choices[0].message.content, strict=True
+        )
+    
+    async def analyze_concurrent(
+        self,
+        files: List[Tuple[str, str]],
+        include_security: bool = True,
+        include_performance: bool = True,
+        include_style: bool = True,
+        max_concurrency: int = 5
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Analyze several files with one request per file, sent concurrently
+        
+        Args:
+            files: List of (filename, code) pairs to analyze
+            include_security: Whether to include security analysis
+            include_performance: Whether to include performance analysis
+            include_style: Whether to include style analysis
+            max_concurrency: Maximum number of requests in flight at once
             
-            return processed_result
+        Returns:
+            One entry per file, in input order: its analysis results, or the
+            exception that prevented analyzing it
+        """
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        # The async client's connection pool is bound to the running event
+        # loop, so it lives only as long as this call
+        async with AsyncOpenAI(api_key=self.config.api_key) as client:
+            async def analyze(filename: str, code: str) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self.analyze_code_async(
+                        client, code, filename,
+                        include_security, include_performance, include_style
+                    )
             
-        except json.JSONDecodeError as e:
-            return self._create_error_result(f"Failed to parse AI response: {str(e)}")
-        except Exception as e:
-            return self._create_error_result(f"Analysis failed: {str(e)}")
+            results = await asyncio.gather(
+                *(analyze(filename, code) for filename, code in files),
+                return_exceptions=True
+            )
+        
+        return list(results)
     
     def _get_system_prompt(self) -> str:
         """Get the system prompt for the AI model"""
@@ -108,6 +395,72 @@ You must respond with a valid JSON object containing:
 
 Be thorough but constructive. Focus on actionable feedback."""
 
+    def _get_batch_system_prompt(self) -> str:
+        """Get the system prompt for multi-file analysis"""
+        return self._get_system_prompt() + """
+
+When several files are provided, respond instead with a JSON object of the form:
+{
+    "files": [
+        {
+            "index": <the number from the file's header>,
+            "filename": "<file name exactly as given>",
+            ...the analysis object described above for that file...
+        }
+    ]
+}
+
+Include exactly one entry per file."""
+
+    def _build_request(
+        self,
+        code: str,
+        filename: str,
+        include_security: bool,
+        include_performance: bool,
+        include_style: bool
+    ) -> Dict[str, Any]:
+        """Build the chat completion arguments for a single-file analysis"""
+        
+        # Determine programming language
+        language = self.config.get_file_extension_language(filename) or "python"
+        
+        # Build analysis prompt
+        prompt = self._build_analysis_prompt(
+            code, language, filename,
+            include_security, include_performance, include_style
+        )
+        
+        return {
+            "model": self.config.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": self._get_system_prompt()
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature,
+            "response_format": self._get_response_format(_ANALYSIS_FORMAT)
+        }
+    
+    def _max_output_tokens(self) -> int:
+        """Get the output token limit of the configured model"""
+        for family, limit in _MAX_OUTPUT_TOKENS.items():
+            if self.config.model.startswith(family):
+                return limit
+        return _DEFAULT_MAX_OUTPUT_TOKENS
+    
+    def _get_response_format(self, schema_format: Dict[str, Any]) -> Dict[str, Any]:
+        """Use the strict schema when the model supports it, plain JSON mode otherwise"""
+        if self.config.model.startswith(_STRUCTURED_OUTPUT_MODELS):
+            return schema_format
+        return {"type": "json_object"}
+
     def _build_analysis_prompt(
         self,
         code: str,
@@ -119,15 +472,9 @@ Be thorough but constructive. Focus on actionable feedback."""
     ) -> str:
         """Build the analysis prompt for the AI model"""
         
-        analysis_aspects = []
-        if include_style:
-            analysis_aspects.append("code quality and style")
-        if include_security:
-            analysis_aspects.append("security vulnerabilities")
-        if include_performance:
-            analysis_aspects.append("performance optimization")
-        
-        aspects_text = ", ".join(analysis_aspects)
+        aspects_text = self._get_aspects_text(
+            include_security, include_performance, include_style
+        )
         
         return f"""Please analyze this {language} code file ({filename}) for {aspects_text}.
 
@@ -145,12 +492,54 @@ Focus on:
 
 Provide scores from 1-10 (10 being excellent) and specific, actionable feedback."""
 
+    def _build_batch_prompt(
+        self,
+        files: List[Tuple[str, str]],
+        include_security: bool,
+        include_performance: bool,
+        include_style: bool
+    ) -> str:
+        """Build the multi-file analysis prompt for the AI model"""
+        
+        aspects_text = self._get_aspects_text(
+            include_security, include_performance, include_style
+        )
+        
+        sections = []
+        for index, (filename, code) in enumerate(files, 1):
+            language = self.config.get_file_extension_language(filename) or "python"
+            sections.append(f"--- FILE {index}: {filename} ---\n```{language}\n{code}\n```")
+        files_text = "\n\n".join(sections)
+        
+        return f"""Please analyze each of these {len(files)} code files for {aspects_text}.
+
+{files_text}
+
+Analyze every file independently and give each its own scores, issues, recommendations and summary."""
+
+    def _get_aspects_text(
+        self,
+        include_security: bool,
+        include_performance: bool,
+        include_style: bool
+    ) -> str:
+        """Describe the selected analysis aspects for the prompt"""
+        analysis_aspects = []
+        if include_style:
+            analysis_aspects.append("code quality and style")
+        if include_security:
+            analysis_aspects.append("security vulnerabilities")
+        if include_performance:
+            analysis_aspects.append("performance optimization")
+        
+        return ", ".join(analysis_aspects)
+
     def _process_analysis_result(self, raw_result: Dict[str, Any]) -> Dict[str, Any]:
         """Process and validate the raw analysis result"""
         
         # Ensure required fields exist
         processed = {
-            "overall_score": raw_result.get("overall_score", 5),
+            "overall_score": raw_result.get("overall_score"),
             "scores": raw_result.get("scores", {}),
             "issues": raw_result.get("issues", []),
             "recommendations": raw_result.get("recommendations", []),
@@ -161,13 +550,13 @@ Provide scores from 1-10 (10 being excellent) and specific, actionable feedback.
         processed["scores"] = self._normalize_scores(processed["scores"])
         
         # Calculate overall score if not provided
-        if not processed["overall_score"] or processed["overall_score"] == 5:
+        if not isinstance(processed["overall_score"], (int, float)):
             scores = processed["scores"]
-            weights = self.config.score_weights
+            quality_weight, security_weight, performance_weight = self._score_weights
             processed["overall_score"] = round(
-                scores.get("Quality", 5) * weights["quality"] +
-                scores.get("Security", 5) * weights["security"] +
-                scores.get("Performance", 5) * weights["performance"],
+                scores["Quality"] * quality_weight +
+                scores["Security"] * security_weight +
+                scores["Performance"] * performance_weight,
                 1
             )
         
@@ -209,11 +598,11 @@ Provide scores from 1-10 (10 being excellent) and specific, actionable feedback.
                 }
                 
                 # Validate severity
-                if validated_issue["severity"] not in ["Low", "Medium", "High", "Critical"]:
+                if not isinstance(validated_issue["severity"], str) or validated_issue["severity"] not in _VALID_SEVERITIES:
                     validated_issue["severity"] = "Medium"
                 
                 # Validate type
-                if validated_issue["type"] not in ["Quality", "Security", "Performance"]:
+                if not isinstance(validated_issue["type"], str) or validated_issue["type"] not in _VALID_TYPES:
                     validated_issue["type"] = "Quality"
                 
                 valid_issues.append(validated_issue)
@@ -222,28 +611,32 @@ Provide scores from 1-10 (10 being excellent) and specific, actionable feedback.
     
     def _create_error_result(self, error_message: str) -> Dict[str, Any]:
         """Create an error result when analysis fails"""
-        return {
-            "overall_score": 0,
-            "scores": {
-                "Quality": 0,
-                "Security": 0,
-                "Performance": 0
-            },
-            "issues": [
-                {
-                    "type": "Quality",
-                    "severity": "High",
-                    "description": f"Analysis failed: {error_message}",
-                    "line": None,
-                    "code": None
-                }
-            ],
-            "recommendations": [
-                "Please check your code syntax and try again",
-                "Ensure your OpenAI API key is valid and has sufficient credits"
-            ],
-            "summary": f"Analysis failed due to: {error_message}"
-        }
+        return create_error_result(error_message)
+
+def create_error_result(error_message: str) -> Dict[str, Any]:
+    """Create an error result when analysis fails"""
+    return {
+        "overall_score": 0,
+        "scores": {
+            "Quality": 0,
+            "Security": 0,
+            "Performance": 0
+        },
+        "issues": [
+            {
+                "type": "Quality",
+                "severity": "High",
+                "description": f"Analysis failed: {error_message}",
+                "line": None,
+                "code": None
+            }
+        ],
+        "recommendations": [
+            "Please check your code syntax and try again",
+            "Ensure your OpenAI API key is valid and has sufficient credits"
+        ],
+        "summary": f"Analysis failed due to: {error_message}"
+    }
 
 class AnalysisHistory:
     """Class to manage analysis history and statistics"""
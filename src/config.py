@@ -1,69 +1,168 @@
 import os
-from typing import Optional
-from pydantic import BaseModel
-from dotenv import load_dotenv
+import re
+import sys
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
 
-# Load environment variables
-load_dotenv()
+# Whether the .env file has been loaded into the environment yet
+_dotenv_loaded = False
 
-class Config(BaseModel):
+# Keys accepted from a .env file; anything else is skipped
+_DOTENV_KEY = re.compile(r"[A-Za-z_][A-Za-z0-9_.]*")
+
+# Quoted .env values, which end at the first unescaped matching quote
+_DOTENV_QUOTED = {
+    '"': re.compile(r'"((?:\\.|[^"\\])*)"'),
+    "'": re.compile(r"'((?:\\'|[^'])*)'"),
+}
+
+# Backslash escapes understood in double-quoted values
+_DOTENV_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', "'": "'", '\\': '\\'}
+_DOTENV_ESCAPE = re.compile(r"\\(.)")
+
+def _find_dotenv() -> Optional[str]:
+    """Find the nearest .env file in this package's directory or its parents"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(directory, ".env")
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+def _parse_dotenv_value(value: str) -> str:
+    """Unquote a .env value, dropping any trailing comment"""
+    pattern = _DOTENV_QUOTED.get(value[:1])
+    match = pattern.match(value) if pattern else None
+    if match is None:
+        # Unquoted values may carry a trailing comment
+        return value.split(' #', 1)[0].rstrip()
+    if value[0] == "'":
+        return match.group(1).replace("\\'", "'")
+    return _DOTENV_ESCAPE.sub(
+        lambda m: _DOTENV_ESCAPES.get(m.group(1), m.group(0)), match.group(1)
+    )
+
+def load_dotenv(path: Optional[str] = None) -> bool:
+    """Load KEY=VALUE pairs from a .env file without overriding existing variables"""
+    path = path or _find_dotenv()
+    if not path:
+        return False
+    
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+    except (OSError, UnicodeDecodeError):
+        return False
+    
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('export '):
+            line = line[len('export '):]
+        
+        key, sep, value = line.partition('=')
+        key = key.strip()
+        if not sep or not _DOTENV_KEY.fullmatch(key):
+            continue
+        
+        try:
+            os.environ.setdefault(key, _parse_dotenv_value(value.strip()))
+        except (OSError, ValueError):
+            continue
+    
+    return True
+
+# Languages and the file extensions (without the leading dot) they use
+_LANGUAGE_EXTENSIONS: Dict[str, Tuple[str, ...]] = {
+    'python': ('py',),
+    'javascript': ('js', 'jsx'),
+    'typescript': ('ts', 'tsx'),
+    'java': ('java',),
+    'cpp': ('cpp', 'hpp'),
+    'c': ('c', 'h'),
+    'go': ('go',),
+    'rust': ('rs',),
+    'php': ('php',),
+    'ruby': ('rb',),
+    'swift': ('swift',),
+    'kotlin': ('kt',),
+    'scala': ('scala',)
+}
+
+# Interned language names shared by every table below
+_LANGS: Tuple[str, ...] = tuple(sys.intern(lang) for lang in _LANGUAGE_EXTENSIONS)
+
+# File extension (without the leading dot) to language mapping
+_EXTENSION_MAP: Dict[str, str] = {
+    ext: lang for lang in _LANGS for ext in _LANGUAGE_EXTENSIONS[lang]
+}
+
+# dataclass(slots=True) is only available on Python 3.10+
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(frozen=True, **_SLOTS)
+class Config:
     """Configuration class for the AI Code Auditor"""
     
     # API Configuration
     api_key: str
     model: str = "gpt-4o"
-    max_tokens: int = 4000
+    max_tokens: int = 1500
     temperature: float = 0.1
     
     # Analysis Configuration
-    max_file_size_mb: int = 5
-    supported_languages: list = [
-        'python', 'javascript', 'typescript', 'java', 'cpp', 'c', 
-        'go', 'rust', 'php', 'ruby', 'swift', 'kotlin', 'scala'
-    ]
+    supported_languages: FrozenSet[str] = frozenset(_LANGS)
     
     # Scoring Configuration
-    score_weights: dict = {
-        'quality': 0.4,
-        'security': 0.35,
-        'performance': 0.25
-    }
+    score_weights: Mapping[str, float] = field(
+        default_factory=lambda: MappingProxyType({
+            'quality': 0.4,
+            'security': 0.35,
+            'performance': 0.25
+        }),
+        hash=False
+    )
     
     @classmethod
     def from_env(cls) -> "Config":
         """Create config from environment variables"""
-        api_key = os.getenv("OPENAI_API_KEY")
+        global _dotenv_loaded
+        if not _dotenv_loaded:
+            load_dotenv()
+            _dotenv_loaded = True
+        
+        env = os.environ
+        api_key = env.get("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
         return cls(
             api_key=api_key,
-            model=os.getenv("OPENAI_MODEL", "gpt-4o"),
-            max_tokens=int(os.getenv("MAX_TOKENS", "4000")),
-            temperature=float(os.getenv("TEMPERATURE", "0.1"))
+            model=env.get("OPENAI_MODEL", "gpt-4o"),
+            max_tokens=int(env.get("MAX_TOKENS", "1500")),
+            temperature=float(env.get("TEMPERATURE", "0.1"))
         )
     
-    def get_file_extension_language(self, filename: str) -> Optional[str]:
+    @staticmethod
+    def get_file_extension_language(filename: str) -> Optional[str]:
         """Get language from file extension"""
-        extension_map = {
-            '.py': 'python',
-            '.js': 'javascript',
-            '.ts': 'typescript',
-            '.tsx': 'typescript',
-            '.jsx': 'javascript',
-            '.java': 'java',
-            '.cpp': 'cpp',
-            '.c': 'c',
-            '.h': 'c',
-            '.hpp': 'cpp',
-            '.go': 'go',
-            '.rs': 'rust',
-            '.php': 'php',
-            '.rb': 'ruby',
-            '.swift': 'swift',
-            '.kt': 'kotlin',
-            '.scala': 'scala'
-        }
-        
-        ext = os.path.splitext(filename)[1].lower()
-        return extension_map.get(ext)
\ No newline at end of file
+        i = filename.rfind('.')
+        if i < 0:
+            return None
+        return _EXTENSION_MAP.get(filename[i + 1:].lower())
+
+@lru_cache(maxsize=None)
+def get_config() -> Config:
+    """Get the process-wide config built from environment variables
+    
+    Preferred over calling Config.from_env directly; the environment is read
+    once and the frozen instance is shared. Call get_config.cache_clear() to
+    pick up environment changes.
+    """
+    return Config.from_env()
\ No newline at end of file
@@ -0,0 +1,46 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict
+
+class Scores(BaseModel):
+    """Per-category scores from 1 to 10"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    Quality: int
+    Security: int
+    Performance: int
+
+class Issue(BaseModel):
+    """A single issue found in the analyzed code"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    type: Literal["Quality", "Security", "Performance"]
+    severity: Literal["Low", "Medium", "High", "Critical"]
+    description: str
+    line: Optional[int]
+    code: Optional[str]
+
+class AnalysisResult(BaseModel):
+    """Structured analysis returned by the model for one file"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    overall_score: float
+    scores: Scores
+    issues: List[Issue]
+    recommendations: List[str]
+    summary: str
+
+class FileAnalysisResult(AnalysisResult):
+    """Analysis of one file within a multi-file response"""
+
+    index: int
+    filename: str
+
+class BatchAnalysisResult(BaseModel):
+    """Structured analysis returned by the model for several files"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    files: List[FileAnalysisResult]